@@ -2,6 +2,7 @@
 # update_stars.py
 # 功能（增强版）：
 #  1) 使用 GITHUB_TOKEN 获取当前用户所有 repo（type=owner），计算 total = sum(stars)+sum(forks)
+#     - 优先走 GraphQL 只取 star/fork 数，失败时退回 REST 分页
 #  2) 尝试多种方式把 total 写回 README.md：
 #     - 优先替换 <!--START_TOTAL_SCORE-->...<!--END_TOTAL_SCORE--> 占位符
 #     - 若无占位符，尝试替换常见的 "Total Stars & Forks:" / "Total Stars + Forks:" / "Total Stars:" 行中数字
@@ -9,69 +10,390 @@
 #     - 最后兜底：若以上都找不到，则追加到 README 末尾
 #
 #  这样可以避免占位符不存在导致脚本直接失败的情况，同时兼容你现有 README 的不同写法。
+#
+#  作为模块 import 时，先调用 configure_session(token) 设置认证，再调用各 fetch 函数：
+#     import update_stars
+#     update_stars.configure_session(os.environ["GITHUB_TOKEN"])
+#     repos = update_stars.fetch_repo_counts_graphql("some-user")
 
 import os
 import re
 import sys
+import json
+import functools
+import threading
+import time
 import requests
-from typing import List, Dict, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
+from typing import Any, Callable, List, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
 
-TOKEN = os.getenv("GITHUB_TOKEN")
-if not TOKEN:
-    print("Error: GITHUB_TOKEN environment variable not set.", file=sys.stderr)
-    sys.exit(1)
+try:
+    import orjson
+except ImportError:  # 未安装时退回标准库 json
+    orjson = None
 
+# 不含 Authorization：由 configure_session() 设置，模块可被其他脚本直接 import 复用
 HEADERS = {
-    "Authorization": f"token {TOKEN}",
     "Accept": "application/vnd.github.v3+json",
     "User-Agent": "update-stars-script"
 }
 
+# 分页并发上限，参考 GitHub 二级限流建议
+MAX_WORKERS = 10
 
-def get_authenticated_user() -> str:
-    resp = requests.get("https://api.github.com/user", headers=HEADERS, timeout=30)
+# 所有 API 请求共用一个 Session，复用 TCP/TLS 连接（keep-alive）
+# 连接池大小与并发数一致，保证每个分页线程都能拿到可复用的连接
+SESSION = requests.Session()
+SESSION.headers.update(HEADERS)
+SESSION.mount("https://", requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=MAX_WORKERS))
+
+
+def configure_session(token: str) -> None:
+    """
+    为共享 SESSION 设置 GitHub token。import 本模块后必须先调用，
+    否则所有请求都是匿名的（REST 限流 60 次/小时，GraphQL 直接失败）。
+    """
+    if not token:
+        raise ValueError("GitHub token must be a non-empty string.")
+    SESSION.headers["Authorization"] = f"token {token}"
+
+
+# 剩余额度低于该值时，下一次请求前等待到限流重置
+RATE_LIMIT_MIN_REMAINING = 2
+
+# 按 X-RateLimit-Resource 分桶（core、graphql 等额度相互独立）记录即将耗尽时的重置时间（epoch 秒），
+# 由发往同一个桶的下一次请求在发送前检查
+_rate_limit_reset_at: Dict[str, float] = {}
+_rate_limit_lock = threading.Lock()
+
+
+def _rate_limit_wait(resp: requests.Response) -> Optional[float]:
+    """
+    根据响应头计算需要等待的秒数：优先 Retry-After，其次 X-RateLimit-Reset。
+    未触及限流时返回 None。
+    """
+    retry_after = resp.headers.get("Retry-After")
+    if retry_after and retry_after.isdigit():
+        return float(retry_after)
+    remaining = resp.headers.get("X-RateLimit-Remaining")
+    reset = resp.headers.get("X-RateLimit-Reset")
+    if remaining is not None and reset and int(remaining) < RATE_LIMIT_MIN_REMAINING:
+        return max(0.0, int(reset) - time.time())
+    return None
+
+
+def _rate_limit_resource(url: str) -> str:
+    # 与 GitHub 返回的 X-RateLimit-Resource 取值一致
+    return "graphql" if url == GRAPHQL_URL else "core"
+
+
+def _record_rate_limit(url: str, resp: requests.Response) -> None:
+    remaining = resp.headers.get("X-RateLimit-Remaining")
+    reset = resp.headers.get("X-RateLimit-Reset")
+    if remaining is None or not reset:
+        return
+    resource = resp.headers.get("X-RateLimit-Resource") or _rate_limit_resource(url)
+    with _rate_limit_lock:
+        if int(remaining) < RATE_LIMIT_MIN_REMAINING:
+            _rate_limit_reset_at[resource] = float(reset)
+        else:
+            _rate_limit_reset_at.pop(resource, None)
+
+
+def _wait_for_rate_limit(url: str) -> None:
+    """
+    发送请求前检查该请求所属额度桶：即将耗尽时等待到重置，其他桶的额度不影响本次请求。
+    等待期间持有锁，并发的分页线程只会有一个在 sleep，其余线程醒来后直接发送。
+    """
+    resource = _rate_limit_resource(url)
+    with _rate_limit_lock:
+        reset_at = _rate_limit_reset_at.pop(resource, None)
+        if reset_at is None:
+            return
+        wait = reset_at - time.time()
+        if wait > 0:
+            print(f"Rate limit ({resource}) nearly exhausted, sleeping {wait:.0f}s until reset.", file=sys.stderr)
+            time.sleep(wait)
+
+
+def _request(method: str, url: str, **kwargs) -> requests.Response:
+    """
+    所有 API 请求的统一入口：被限流（403/429）时按响应头等待后重试一次；
+    上一次响应显示额度即将耗尽时，本次请求发送前先等待重置。
+    只在确实还有请求要发时才等待，最后一个请求之后不会白白 sleep。
+    """
+    kwargs.setdefault("timeout", 30)
+    _wait_for_rate_limit(url)
+    resp = SESSION.request(method, url, **kwargs)
+    if resp.status_code in (403, 429):
+        wait = _rate_limit_wait(resp)
+        if wait is not None:
+            print(f"Rate limited, retrying in {wait:.0f}s.", file=sys.stderr)
+            time.sleep(wait)
+            resp = SESSION.request(method, url, **kwargs)
+    _record_rate_limit(url, resp)
+    return resp
+
+
+def _loads(content: bytes) -> Any:
+    return orjson.loads(content) if orjson is not None else json.loads(content)
+
+
+# ETag 条件请求缓存：URL -> {"etag", "link", "body"}，命中 304 时复用 body，不消耗主限流额度
+# 缓存文件会被 actions/cache 上传，body 只能存 parse 之后的必要字段，不要存原始响应
+ETAG_CACHE_PATH = os.path.join(".cache", "stars_etags.json")
+# 修改任何 parse 函数的输出结构时递增，旧版本的缓存文件会被整体丢弃
+ETAG_CACHE_VERSION = 1
+_etag_cache: Optional[Dict[str, Dict]] = None
+_etag_lock = threading.Lock()
+
+
+def _load_etag_cache() -> Dict[str, Dict]:
+    global _etag_cache
+    with _etag_lock:
+        if _etag_cache is None:
+            try:
+                with open(ETAG_CACHE_PATH, "r", encoding="utf-8") as f:
+                    stored = json.load(f)
+                if not isinstance(stored, dict) or stored.get("version") != ETAG_CACHE_VERSION:
+                    stored = {"entries": {}}
+                _etag_cache = stored["entries"]
+            except (OSError, ValueError, KeyError):
+                _etag_cache = {}
+        return _etag_cache
+
+
+def save_etag_cache() -> None:
+    if not _etag_cache:
+        return
+    os.makedirs(os.path.dirname(ETAG_CACHE_PATH), exist_ok=True)
+    with _etag_lock:
+        with open(ETAG_CACHE_PATH, "w", encoding="utf-8") as f:
+            json.dump({"version": ETAG_CACHE_VERSION, "entries": _etag_cache}, f, ensure_ascii=False)
+
+
+def _parse_links(link_header: str) -> Dict[str, Dict]:
+    # 与 requests.Response.links 的结构保持一致
+    links = {}
+    for link in requests.utils.parse_header_links(link_header):
+        links[link.get("rel") or link.get("url")] = link
+    return links
+
+
+def _conditional_get(url: str, parse: Callable[[Any], Any],
+                     params: Optional[Dict] = None) -> Tuple[Any, Dict[str, Dict]]:
+    """
+    带 If-None-Match 的 GET：304 时直接返回缓存的结果，200 时更新缓存。
+    缓存的是 parse 之后的结果（parse 必须只保留需要的字段），返回 (parsed_body, links)。
+    """
+    cache = _load_etag_cache()
+    key = requests.Request("GET", url, params=params).prepare().url
+    cached = cache.get(key)
+    headers = {"If-None-Match": cached["etag"]} if cached else None
+
+    resp = _request("GET", url, params=params, headers=headers)
+    if resp.status_code == 304 and cached:
+        # ETag 只覆盖响应体，不覆盖 Link 头：后面的页新增 repo 时第 1 页仍会 304，
+        # 但分页信息已变，所以优先用本次 304 自带的 Link，没有时才退回缓存的
+        link = resp.headers.get("Link")
+        if link is None:
+            return cached["body"], _parse_links(cached.get("link", ""))
+        with _etag_lock:
+            cached["link"] = link
+        return cached["body"], _parse_links(link)
     resp.raise_for_status()
-    login = resp.json().get("login")
+
+    body = parse(_loads(resp.content))
+    etag = resp.headers.get("ETag")
+    if etag:
+        with _etag_lock:
+            cache[key] = {"etag": etag, "link": resp.headers.get("Link", ""), "body": body}
+    return body, resp.links
+
+
+def get_authenticated_user() -> str:
+    # /user 响应含邮箱、plan 等信息，缓存里只保留 login
+    data, _ = _conditional_get("https://api.github.com/user", parse=lambda d: {"login": d.get("login")})
+    login = data.get("login")
     if not login:
         raise RuntimeError("Could not determine authenticated user's login.")
     return login
 
 
+def _parse_repos_page(data: Any) -> List[Dict]:
+    """
+    只保留计算需要的两个字段，完整的 repo JSON 随响应一起释放，不会在整个分页过程中累积。
+    """
+    if not isinstance(data, list):
+        raise RuntimeError(f"Unexpected response fetching repos: {data}")
+    return [{"stargazers_count": r.get("stargazers_count", 0),
+             "forks_count": r.get("forks_count", 0)} for r in data]
+
+
+def _fetch_repos_page(user: str, page: int, per_page: int) -> Tuple[List[Dict], Dict[str, Dict]]:
+    url = f"https://api.github.com/users/{user}/repos"
+    params = {"per_page": per_page, "page": page, "type": "owner", "sort": "full_name"}
+    return _conditional_get(url, parse=_parse_repos_page, params=params)
+
+
 def fetch_all_repos(user: str) -> List[Dict]:
-    repos = []
-    page = 1
+    """
+    先同步请求第 1 页，从 Link 头的 rel="last" 得到总页数，
+    再并发请求剩余页面（最多 MAX_WORKERS 个并发，避免触发 GitHub 二级限流）。
+    是否还有下一页只看 Link 头的 rel="next"，不依赖 len(data) < per_page，
+    总数恰为 100 整数倍时也不会多发一次空页请求。
+    """
     per_page = 100
+    first_page, links = _fetch_repos_page(user, 1, per_page)
+    # 拷贝一份再 extend，避免改写缓存中的第 1 页
+    repos = list(first_page)
+
+    last = links.get("last")
+    if not last:
+        # 没有 rel="last" 时退回按 rel="next" 逐页请求
+        page = 1
+        while "next" in links:
+            page += 1
+            data, links = _fetch_repos_page(user, page, per_page)
+            repos.extend(data)
+        return repos
+    last_page = int(parse_qs(urlparse(last["url"]).query)["page"][0])
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        # map 保持页码顺序，结果与逐页请求一致
+        pages = pool.map(lambda p: _fetch_repos_page(user, p, per_page), range(2, last_page + 1))
+        for data, _ in pages:
+            repos.extend(data)
+    return repos
+
+
+GRAPHQL_URL = "https://api.github.com/graphql"
+
+# 别名为 REST 字段名，返回的节点可直接交给 calculate_total_score
+REPO_COUNTS_QUERY = """
+query($login: String!, $cursor: String) {
+  user(login: $login) {
+    repositories(ownerAffiliations: OWNER, privacy: PUBLIC, first: 100, after: $cursor) {
+      nodes { stargazers_count: stargazerCount forks_count: forkCount }
+      pageInfo { hasNextPage endCursor }
+    }
+  }
+}
+"""
+
+
+def fetch_repo_counts_graphql(user: str) -> List[Dict]:
+    """
+    通过 GraphQL 只拉取每个 repo 的 star/fork 数，每页 100 个，用 endCursor 翻页。
+    相比 REST 的完整 repo JSON，响应体小两个数量级。
+    """
+    repos = []
+    cursor = None
     while True:
-        url = f"https://api.github.com/users/{user}/repos"
-        params = {"per_page": per_page, "page": page, "type": "owner", "sort": "full_name"}
-        resp = requests.get(url, headers=HEADERS, params=params, timeout=30)
+        payload = {"query": REPO_COUNTS_QUERY, "variables": {"login": user, "cursor": cursor}}
+        resp = _request("POST", GRAPHQL_URL, json=payload)
         resp.raise_for_status()
-        data = resp.json()
-        if not isinstance(data, list):
-            raise RuntimeError(f"Unexpected response fetching repos: {data}")
-        repos.extend(data)
-        if len(data) < per_page:
+        body = _loads(resp.content)
+        if body.get("errors") or not (body.get("data") or {}).get("user"):
+            raise RuntimeError(f"Unexpected GraphQL response fetching repos: {body}")
+        conn = body["data"]["user"]["repositories"]
+        # nodes 的类型是 [Repository]，单个元素可能为 null
+        repos.extend(n for n in conn["nodes"] if n)
+        if not conn["pageInfo"]["hasNextPage"]:
             break
-        page += 1
+        cursor = conn["pageInfo"]["endCursor"]
+    return repos
+
+
+# 单次 GraphQL 请求里最多合并的 repository 别名查询数
+GRAPHQL_BATCH_SIZE = 100
+
+
+def fetch_repo_counts_by_name(owner: str, names: List[str]) -> List[Dict]:
+    """
+    按名字批量查询指定 repo 的 star/fork 数：每 GRAPHQL_BATCH_SIZE 个 repo 合并为一个
+    带别名（r0, r1, ...）的查询，N 个 repo 只需 ceil(N/100) 次请求。
+    repo 名通过变量传入，不拼接进查询字符串；不存在（NOT_FOUND）的 repo 会被跳过，其他错误直接报错。
+    """
+    repos = []
+    for offset in range(0, len(names), GRAPHQL_BATCH_SIZE):
+        batch = names[offset:offset + GRAPHQL_BATCH_SIZE]
+        var_defs = "".join(f", $n{i}: String!" for i in range(len(batch)))
+        fields = " ".join(
+            f"r{i}: repository(owner: $owner, name: $n{i}) {{ stargazers_count: stargazerCount forks_count: forkCount }}"
+            for i in range(len(batch))
+        )
+        variables = {"owner": owner}
+        variables.update({f"n{i}": name for i, name in enumerate(batch)})
+        payload = {"query": f"query($owner: String!{var_defs}) {{ {fields} }}", "variables": variables}
+
+        resp = _request("POST", GRAPHQL_URL, json=payload)
+        resp.raise_for_status()
+        body = _loads(resp.content)
+        data = body.get("data")
+        if not data:
+            raise RuntimeError(f"Unexpected GraphQL response fetching repos: {body}")
+        # 只有 NOT_FOUND 表示 repo 不存在，可以跳过；FORBIDDEN、RATE_LIMITED、超时等错误
+        # 同样会让别名为 null，跳过会让总数偏小，必须报错
+        not_found = set()
+        for err in body.get("errors") or []:
+            path = err.get("path") or []
+            if err.get("type") == "NOT_FOUND" and len(path) == 1:
+                not_found.add(path[0])
+            else:
+                raise RuntimeError(f"Unexpected GraphQL response fetching repos: {body}")
+        for i in range(len(batch)):
+            node = data.get(f"r{i}")
+            if node:
+                repos.append(node)
+            elif f"r{i}" not in not_found:
+                raise RuntimeError(f"Unexpected GraphQL response fetching repos: {body}")
     return repos
 
 
 def calculate_total_score(repos: List[Dict]) -> Tuple[int, int, int]:
-    total_stars = sum(int(r.get("stargazers_count", 0) or 0) for r in repos)
-    total_forks = sum(int(r.get("forks_count", 0) or 0) for r in repos)
+    # 单次遍历同时累加 star 和 fork，不做逐项转换：
+    # 调用方需保证 repos 中没有 None 且两个字段都是 int（各 fetch 函数已过滤 null 节点，REST 路径只保留这两个字段）
+    get_counts = itemgetter("stargazers_count", "forks_count")
+    total_stars = total_forks = 0
+    for r in repos:
+        stars, forks = get_counts(r)
+        total_stars += stars
+        total_forks += forks
     total = total_stars + total_forks
     return total, total_stars, total_forks
 
 
+PLACEHOLDER_START = "<!--START_TOTAL_SCORE-->"
+PLACEHOLDER_END = "<!--END_TOTAL_SCORE-->"
+
+# README 匹配用的正则，模块加载时编译一次
+# 匹配包含 "Total" 和 "Stars" 的行，允许同时出现 "Forks" 或不出现
+# 注意不要在 .* 前再叠加可重叠的量词（如 [ \t>*-]*），否则失败匹配会退化为多项式回溯
+_TOTAL_LINE_RE = re.compile(r"^(.*Total\s+Stars(?:\s*(?:(?:\+|&|and)\s*)?Forks)?\s*[:：]\s*)(\S+)(.*)$",
+                            re.IGNORECASE | re.MULTILINE)
+_STATUS_HEADING_RE = re.compile(r"^(###\s*⭐\s*Github Status:.*)$", re.MULTILINE)
+
+
 def replace_placeholder(text: str, total: int) -> Tuple[str, bool]:
     """
     优先使用 <!--START_TOTAL_SCORE-->...<!--END_TOTAL_SCORE--> 占位符替换
     """
-    pattern = re.compile(r"(<!--START_TOTAL_SCORE-->)(.*?)(<!--END_TOTAL_SCORE-->)", re.S)
-    if pattern.search(text):
-        new_text = pattern.sub(lambda m: m.group(1) + str(total) + m.group(3), text, count=1)
-        return new_text, True
-    return text, False
+    # 占位符是固定字符串，直接 str.find 定位后拼接，无需正则
+    i = text.find(PLACEHOLDER_START)
+    if i < 0:
+        return text, False
+    start = i + len(PLACEHOLDER_START)
+    j = text.find(PLACEHOLDER_END, start)
+    if j < 0:
+        return text, False
+    value = str(total)
+    if text[start:j] == value:
+        # 数值未变，原样返回，调用方据此跳过写文件
+        return text, True
+    return text[:start] + value + text[j:], True
 
 
 def replace_common_line(text: str, total: int) -> Tuple[str, bool]:
@@ -82,12 +404,11 @@ def replace_common_line(text: str, total: int) -> Tuple[str, bool]:
       > ✨ Total Stars & Forks: 123
       * Total Stars & Forks: 123
     """
-    # 匹配包含 "Total" 和 "Stars" 的行，允许同时出现 "Forks" 或不出现
-    pattern = re.compile(r"^([ \t>*-]*.*Total\s+Stars(?:\s*(?:\+|&|and)?\s*Forks)?\s*[:：]\s*)(\S+)(.*)$",
-                         re.IGNORECASE | re.MULTILINE)
-    def _repl(m):
-        return m.group(1) + str(total) + m.group(3)
-    new_text, n = pattern.subn(_repl, text, count=1)
+    # 先做一次子串预检（正则是 IGNORECASE，这里用 casefold 对齐），不含关键字时跳过正则扫描
+    if "stars" not in text.casefold():
+        return text, False
+    # 用 \g<n> 模板而非回调：避免 "\1" + 数字被解析成 "\12" 之类的歧义，也省去每次匹配的 Python 函数调用
+    new_text, n = _TOTAL_LINE_RE.subn(rf"\g<1>{total}\g<3>", text, count=1)
     return new_text, n > 0
 
 
@@ -95,71 +416,104 @@ def insert_under_status_heading(text: str, total: int) -> Tuple[str, bool]:
     """
     如果没匹配到任何行，尝试在 "### ⭐ Github Status:" 这一行下面插入统计占位行。
     """
-    heading_pattern = re.compile(r"^(###\s*⭐\s*Github Status:.*)$", re.MULTILINE)
-    m = heading_pattern.search(text)
+    if "Github Status:" not in text:
+        return text, False
+    m = _STATUS_HEADING_RE.search(text)
     insert_line = f"\n> 🌟 **Total Stars + Forks:** <!--START_TOTAL_SCORE-->{total}<!--END_TOTAL_SCORE-->\n"
     if m:
         # 在匹配行之后插入
         idx = m.end(1)
-        new_text = text[:idx] + insert_line + text[idx:]
+        new_text = "".join((text[:idx], insert_line, text[idx:]))
         return new_text, True
     return text, False
 
 
-def append_to_end(text: str, total: int) -> Tuple[str, bool]:
+def append_to_end(readme_path: str, total: int) -> None:
     """
-    兜底：追加到 README 末尾
+    兜底：以追加模式只写入统计行到 README 末尾，不重写整个文件
     """
     append_line = f"\n---\n> 🌟 **Total Stars + Forks:** <!--START_TOTAL_SCORE-->{total}<!--END_TOTAL_SCORE-->\n"
-    new_text = text + append_line
-    return new_text, True
+    with open(readme_path, "a", encoding="utf-8") as f:
+        f.write(append_line)
+
+
+@functools.lru_cache(maxsize=4)
+def _load_text(path: str, mtime_ns: int, size: int) -> str:
+    """
+    以 (mtime, size) 为键缓存文件内容：同一进程内重复运行且文件未变时不再重新读取内容，
+    每次调用只剩调用方的一次 os.stat。mtime_ns/size 只参与缓存键。
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def _write_text_atomic(path: str, text: str) -> None:
+    """
+    先写临时文件再 os.replace 覆盖，写到一半中断也不会留下被截断的 README。
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
 
 
 def update_readme_robust(total: int) -> None:
     readme_path = "README.md"
-    if not os.path.exists(readme_path):
-        raise FileNotFoundError("README.md not found in repo root.")
-
-    with open(readme_path, "r", encoding="utf-8") as f:
-        text = f.read()
+    try:
+        st = os.stat(readme_path)
+    except FileNotFoundError:
+        raise FileNotFoundError("README.md not found in repo root.") from None
+    text = _load_text(readme_path, st.st_mtime_ns, st.st_size)
 
     # 1) 占位符替换
     new_text, done = replace_placeholder(text, total)
     if done:
-        with open(readme_path, "w", encoding="utf-8") as f:
-            f.write(new_text)
+        if new_text == text:
+            print("README already up to date, skipping write.")
+            return
+        _write_text_atomic(readme_path, new_text)
         print("Replaced using explicit placeholder <!--START_TOTAL_SCORE-->...<!--END_TOTAL_SCORE-->.")
         return
 
     # 2) 替换常见的 Total 行
     new_text, done = replace_common_line(text, total)
     if done:
-        with open(readme_path, "w", encoding="utf-8") as f:
-            f.write(new_text)
+        if new_text == text:
+            print("README already up to date, skipping write.")
+            return
+        _write_text_atomic(readme_path, new_text)
         print("Replaced an existing 'Total Stars' line in README.")
         return
 
     # 3) 在 Github Status 标题下插入（如果存在该标题）
     new_text, done = insert_under_status_heading(text, total)
     if done:
-        with open(readme_path, "w", encoding="utf-8") as f:
-            f.write(new_text)
+        _write_text_atomic(readme_path, new_text)
         print("Inserted total line under '### ⭐ Github Status:' heading.")
         return
 
     # 4) 兜底追加到末尾
-    new_text, done = append_to_end(text, total)
-    with open(readme_path, "w", encoding="utf-8") as f:
-        f.write(new_text)
+    append_to_end(readme_path, total)
     print("Appended total line at README end as a fallback.")
 
 
 def main():
+    token = os.getenv("GITHUB_TOKEN")
+    if not token:
+        print("Error: GITHUB_TOKEN environment variable not set.", file=sys.stderr)
+        sys.exit(1)
+    configure_session(token)
+
     try:
         user = get_authenticated_user()
         print(f"Authenticated as: {user}")
 
-        repos = fetch_all_repos(user)
+        try:
+            repos = fetch_repo_counts_graphql(user)
+        except (requests.HTTPError, RuntimeError) as e:
+            # GraphQL 不可用时退回 REST 分页
+            print(f"GraphQL fetch failed ({e}), falling back to REST.", file=sys.stderr)
+            repos = fetch_all_repos(user)
         print(f"Fetched {len(repos)} repositories (type=owner).")
 
         total, stars, forks = calculate_total_score(repos)
@@ -168,6 +522,8 @@ def main():
         update_readme_robust(total)
         print("README update completed successfully.")
 
+        save_etag_cache()
+
     except requests.HTTPError as e:
         print("HTTP Error:", e, file=sys.stderr)
         if e.response is not None: